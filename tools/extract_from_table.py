@@ -4,105 +4,315 @@ Extract assets from ROM using a pre-built file table.
 """
 
 import json
+import mmap
 import os
+import pickle
 import sys
 import csv
+import io
+import struct
+import threading
+import traceback
 import zlib
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+from functools import lru_cache
 import numpy as np
 from PIL import Image
 
-def decode_rgba5551_to_rgb(value):
-    """Decode a single RGBA5551 value to RGB tuple."""
-    r = ((value >> 11) & 0x1F) * 255 // 31
-    g = ((value >> 6) & 0x1F) * 255 // 31
-    b = ((value >> 1) & 0x1F) * 255 // 31
-    return (r, g, b)
+try:
+    from numba import njit
+except ImportError:  # Numba is optional; the NumPy paths are used without it
+    njit = None
+
+try:
+    import orjson
+except ImportError:  # orjson is optional; the standard json module is used without it
+    orjson = None
+
+# Compressed input is fed to zlib in pieces of this size when streaming
+DECOMPRESS_CHUNK_SIZE = 64 * 1024
+
+# Palette image headers claiming more decompressed data than this are treated as corrupt
+MAX_DECOMPRESSED_SIZE = 100 * 1024 * 1024
+
+# Extracted PNGs favour encode speed over size (PIL's default level is 6); see --png-level
+PNG_COMPRESS_LEVEL = 1
+
+# Bump when parse_file_addresses changes what it stores, so old file table caches are rebuilt
+FILE_TABLE_CACHE_VERSION = 1
+
+# EXTRACT_VERBOSE=1 logs per-file details, 2 also logs raw image headers
+VERBOSE = int(os.environ.get('EXTRACT_VERBOSE', '0'))
+DEBUG = VERBOSE >= 2
+
+# Per-file messages are buffered per worker thread so each file's output stays together
+_task_log = threading.local()
+
+def _emit(message):
+    """Print a message, or buffer it when called from an extraction task."""
+    lines = getattr(_task_log, 'lines', None)
+    if lines is None:
+        print(message)
+    else:
+        lines.append(message)
+
+def log(message):
+    """Log a per-file detail message (only shown with EXTRACT_VERBOSE)."""
+    if VERBOSE:
+        _emit(message)
+
+def warn(message):
+    """Log a per-file warning or error (always shown)."""
+    _emit(message)
+
+# 5-bit channel values expanded to 8 bits by bit replication: (c << 3) | (c >> 2)
+_EXPAND5 = np.array([(c << 3) | (c >> 2) for c in range(32)], dtype=np.uint8)
+
+def decode_rgba5551_array(words):
+    """Decode an array of RGBA5551 values to an (..., 3) uint8 RGB array."""
+    words = np.asarray(words, dtype=np.uint16)
+    rgb = np.empty(words.shape + (3,), dtype=np.uint8)
+    for channel, shift in enumerate((11, 6, 1)):
+        rgb[..., channel] = _EXPAND5[(words >> shift) & 0x1F]
+    return rgb
+
+# Every possible RGBA5551 value decoded once (65536 x 3 bytes), so decoding is a lookup
+_RGBA5551_LUT = decode_rgba5551_array(np.arange(65536, dtype=np.uint16))
+
+if njit is not None:
+    # Files are already decoded in parallel on the extraction thread pool, so the
+    # kernel runs serially and releases the GIL rather than using prange
+    @njit(nogil=True, cache=True)
+    def _decode_rgba5551_block(be_bytes, out):
+        """Decode big-endian RGBA5551 bytes into a flat RGB buffer in a single pass."""
+        for i in range(len(out) // 3):
+            word = (be_bytes[2 * i] << 8) | be_bytes[2 * i + 1]
+            r = (word >> 11) & 0x1F
+            g = (word >> 6) & 0x1F
+            b = (word >> 1) & 0x1F
+            out[3 * i] = (r << 3) | (r >> 2)
+            out[3 * i + 1] = (g << 3) | (g >> 2)
+            out[3 * i + 2] = (b << 3) | (b >> 2)
+    
+    @njit(nogil=True, cache=True)
+    def _render_palette_grid(indices, palette_bytes, palette_color_size, available, out):
+        """Decode each big-endian palette and render it into its (rows, H, cols, W, 3) grid cell in one pass."""
+        height, width = indices.shape
+        cols = out.shape[2]
+        lut = np.empty((palette_color_size, 3), dtype=np.uint8)
+        for p in range(available):
+            # Palettes are tiny, so decode each into a scratch LUT that stays in L1
+            base = 2 * p * palette_color_size
+            for c in range(palette_color_size):
+                word = (palette_bytes[base + 2 * c] << 8) | palette_bytes[base + 2 * c + 1]
+                r = (word >> 11) & 0x1F
+                g = (word >> 6) & 0x1F
+                b = (word >> 1) & 0x1F
+                lut[c, 0] = (r << 3) | (r >> 2)
+                lut[c, 1] = (g << 3) | (g >> 2)
+                lut[c, 2] = (b << 3) | (b >> 2)
+            row, col = p // cols, p % cols
+            for y in range(height):
+                for x in range(width):
+                    index = indices[y, x]
+                    out[row, y, col, x, 0] = lut[index, 0]
+                    out[row, y, col, x, 1] = lut[index, 1]
+                    out[row, y, col, x, 2] = lut[index, 2]
+
+def decode_rgba5551_image(data, width, height):
+    """Decode big-endian RGBA5551 image data to a (height, width, 3) uint8 array."""
+    words = np.frombuffer(data, dtype='>u2').reshape((height, width))
+    if njit is None:
+        # Single gather; indexing with the (H, W) words gives (H, W, 3) directly
+        return _RGBA5551_LUT[words]
+    
+    # Fused Numba kernel: one pass over the input, no intermediate channel arrays
+    image_data = np.empty((height, width, 3), dtype=np.uint8)
+    _decode_rgba5551_block(np.frombuffer(data, dtype=np.uint8), image_data.reshape(-1))
+    return image_data
+
+def decode_palette_entries(palette_data):
+    """Decode big-endian palette data to an array of 16-bit RGBA5551 entries."""
+    # Zero-copy big-endian view; slices per palette stay views too
+    return np.frombuffer(palette_data, dtype='>u2')
 
 def decode_palette_to_rgb(palette_entries):
     """Decode palette entries to RGB values."""
-    return [decode_rgba5551_to_rgb(entry) for entry in palette_entries]
+    return _RGBA5551_LUT[np.asarray(palette_entries)]
 
-def render_palette_image(pixel_indices, palette_rgb, width, height):
-    """Render image using pixel indices and palette."""
-    pixels = [palette_rgb[idx] if idx < len(palette_rgb) else (0, 0, 0) 
-              for idx in pixel_indices]
-    
-    return np.array(pixels, dtype=np.uint8).reshape((height, width, 3))
+@lru_cache(maxsize=512)
+def _palette_lut_from_bytes(palette_bytes):
+    """Decode raw big-endian palette bytes to a read-only (N, 3) RGB LUT (memoised)."""
+    lut = decode_palette_to_rgb(decode_palette_entries(palette_bytes))
+    lut.setflags(write=False)
+    return lut
+
+def palette_lut(palette_entries):
+    """Get the RGB LUT for palette entries, reusing it when the same palette was seen before."""
+    # Many assets share palettes, so key the cache on the raw palette bytes
+    return _palette_lut_from_bytes(np.asarray(palette_entries, dtype='>u2').tobytes())
+
+def write_png(image, output_path):
+    """Encode a PIL image as PNG in memory, then write it out in one raw write."""
+    buffer = io.BytesIO()
+    image.save(buffer, 'PNG', compress_level=PNG_COMPRESS_LEVEL)
+    write_raw_file(output_path, buffer.getbuffer())
 
-def render_single_palette(pixel_indices, palette_entries, width, height, output_path):
+def save_png(pixels, output_path):
+    """Save an (H, W, 3) uint8 RGB pixel array as a PNG."""
+    height, width = pixels.shape[:2]
+    write_png(Image.frombuffer('RGB', (width, height), np.ascontiguousarray(pixels), 'raw', 'RGB', 0, 1), output_path)
+
+def render_single_palette(pixel_indices, palette_entries, width, height, output_path, palette_color_size=256):
     """Render image with single palette."""
-    palette_rgb = decode_palette_to_rgb(palette_entries)
-    pixels = render_palette_image(pixel_indices, palette_rgb, width, height)
+    palette_rgb = palette_lut(palette_entries)
+    if len(palette_rgb) < palette_color_size:
+        # Indices past the end of the palette fall through to black
+        padded = np.zeros((palette_color_size, 3), dtype=np.uint8)
+        padded[:len(palette_rgb)] = palette_rgb
+        palette_rgb = padded
     
-    img = Image.fromarray(pixels)
-    img.save(output_path, 'PNG')
-    print(f"  [OK] Saved single palette: {output_path}")
+    # Save as a paletted PNG: the indices go to the encoder as-is with the palette
+    # in a PLTE chunk, so there is no per-pixel RGB expansion
+    indices = np.ascontiguousarray(pixel_indices, dtype=np.uint8)
+    image = Image.frombuffer('P', (width, height), indices, 'raw', 'P', 0, 1)
+    image.putpalette(palette_rgb.tobytes())
+    write_png(image, output_path)
+    log(f"  [OK] Saved single palette: {output_path}")
 
 def render_multiple_palettes(pixel_indices, palette_entries, palette_count, width, height, output_path, palette_color_size=256):
     """Render image with multiple palettes in a grid layout."""
-    print(f"  Combining {palette_count} palettes into grid...")
+    log(f"  Combining {palette_count} palettes into grid...")
     
     # Calculate grid dimensions
     cols = min(palette_count, 4)
     rows = (palette_count + cols - 1) // cols
     
-    # Create combined image
-    combined_pixels = np.zeros((height * rows, width * cols, 3), dtype=np.uint8)
+    # Pixel indices are shared by every palette; only the lookup table changes per tile
+    indices = np.asarray(pixel_indices, dtype=np.uint8).reshape((height, width))
     
-    for i in range(palette_count):
-        # Extract palette data
-        start = i * palette_color_size
-        end = start + palette_color_size
-        
-        if end > len(palette_entries):
-            print(f"  [WARN] Palette {i} extends beyond available entries")
-            break
-        
-        # Render this palette
-        palette_rgb = decode_palette_to_rgb(palette_entries[start:end])
-        pixels = render_palette_image(pixel_indices, palette_rgb, width, height)
+    # Only complete palettes are rendered; missing ones are left black
+    available = min(palette_count, len(palette_entries) // palette_color_size)
+    if available < palette_count:
+        warn(f"  [WARN] Palette {available} extends beyond available entries")
+    
+    # The image is allocated as (rows, H, cols, W, 3) so its (rows, cols, H, W, 3)
+    # transpose is a view of the grid cells. A full grid overwrites every byte, so
+    # only grids with empty cells need zeroing
+    allocate = np.empty if available == rows * cols else np.zeros
+    grid = allocate((rows, height, cols, width, 3), dtype=np.uint8)
+    if njit is not None:
+        # Fused Numba kernel: palettes are decoded and tiles rendered without building RGB LUT arrays
+        palette_bytes = np.asarray(palette_entries[:available * palette_color_size], dtype='>u2').view(np.uint8)
+        _render_palette_grid(indices, palette_bytes, palette_color_size, available, grid)
+    else:
+        luts = np.zeros((rows * cols, palette_color_size, 3), dtype=np.uint8)
+        for i in range(available):
+            luts[i] = palette_lut(palette_entries[i * palette_color_size:(i + 1) * palette_color_size])
         
-        # Place in grid
-        row, col = i // cols, i % cols
-        y1, y2 = row * height, (row + 1) * height
-        x1, x2 = col * width, (col + 1) * width
-        combined_pixels[y1:y2, x1:x2] = pixels
+        # Gather every tile in a single np.take. Indices always fit the LUTs (CI4 nibbles /
+        # CI8 bytes), so 'clip' never alters them; it just lets np.take write straight into
+        # the view instead of via a temporary
+        np.take(luts.reshape((rows, cols, palette_color_size, 3)), indices, axis=2,
+                out=grid.transpose(0, 2, 1, 3, 4), mode='clip')
+    combined_pixels = grid.reshape((height * rows, width * cols, 3))
     
     # Save image
-    Image.fromarray(combined_pixels).save(output_path, 'PNG')
-    print(f"  [OK] Saved combined image ({rows}x{cols} grid): {output_path}")
+    save_png(combined_pixels, output_path)
+    log(f"  [OK] Saved combined image ({rows}x{cols} grid): {output_path}")
     
+def has_zlib_header(data):
+    """Check for a valid 2-byte zlib header (deflate, window <= 32K, no preset dictionary)."""
+    # The ROM's streams start 68 DE rather than the common 78 xx, so check the header
+    # fields and FCHECK instead of matching specific magic bytes
+    if len(data) < 2:
+        return False
+    cmf, flg = data[0], data[1]
+    return (cmf & 0x0F) == 8 and (cmf >> 4) <= 7 and not flg & 0x20 and ((cmf << 8) | flg) % 31 == 0
+
+def iter_decompress(decompressor, compressed_data):
+    """Yield decompressed chunks, feeding the input to zlib in DECOMPRESS_CHUNK_SIZE pieces."""
+    source = memoryview(compressed_data)
+    for offset in range(0, len(source), DECOMPRESS_CHUNK_SIZE):
+        yield decompressor.decompress(source[offset:offset + DECOMPRESS_CHUNK_SIZE])
+    yield decompressor.flush()
+    
+    # Match zlib.decompress, which rejects truncated streams
+    if not decompressor.eof:
+        raise zlib.error("incomplete or truncated stream")
+
+def decompress_into_array(chunks, expected_size, prefix=b''):
+    """Collect decompressed chunks (see iter_decompress) into a preallocated uint8 array.
+    
+    prefix is output already taken from chunks (e.g. a header).
+    expected_size only sizes the buffer; the returned array always holds
+    exactly what the stream decompresses to.
+    """
+    out = np.empty(max(expected_size, len(prefix)), dtype=np.uint8)
+    view = memoryview(out)
+    pos = len(prefix)
+    view[:pos] = prefix
+    overflow = []
+    
+    for chunk in chunks:
+        fits = min(len(chunk), len(out) - pos)
+        view[pos:pos + fits] = chunk[:fits]
+        pos += fits
+        if fits < len(chunk):
+            overflow.append(chunk[fits:])
+    
+    if overflow:
+        # Stream is longer than expected; grow rather than drop data
+        return np.concatenate([out, np.frombuffer(b''.join(overflow), dtype=np.uint8)])
+    return out[:pos]
+
+def unpack_ci4_indices(data, pixel_count):
+    """Unpack 4-bit packed indices (upper nibble first) to 8-bit indices."""
+    packed = np.frombuffer(data, dtype=np.uint8)
+    indices = np.empty(packed.size * 2, dtype=np.uint8)
+    indices[0::2] = packed >> 4
+    indices[1::2] = packed & 0x0F
+    return indices[:pixel_count]  # Trim to exact count
+
+def parse_header(decompressed_data, start_offset=20):
+    """Parse the image header into a list of big-endian uint32 values."""
+    return list(struct.unpack(f'>{start_offset // 4}I', decompressed_data[:start_offset]))
+
 def convert_16bit_palette_to_png(compressed_data, output_path):
     """Convert 16-bit palette image data to PNG format."""
+    if not has_zlib_header(compressed_data):
+        warn("  [WARN] Not a zlib stream, skipping palette conversion")
+        return False
+    
     try:
-        # Decompress the data
-        decompressed = zlib.decompress(compressed_data)
-        
-        # Parse header from decompressed data
+        # Pull chunks until the header is available; the rest is streamed once its size is known.
+        # Reading from the same chunk stream avoids copying the compressed input into unconsumed_tail
         start_offset = 20
+        chunks = iter_decompress(zlib.decompressobj(), compressed_data)
+        header = b''
+        for chunk in chunks:
+            header += chunk
+            if len(header) >= start_offset:
+                break
 
-        # Parse header into 5 uint32 big-endian values
-        header_values = [int.from_bytes(decompressed[i:i+4], byteorder='big') 
-                        for i in range(0, start_offset, 4)]
-        print(f"  Header values: {header_values}")
-
-        width = header_values[1]
-        height = header_values[2]
-        palette_color_size = header_values[3]
-        palette_count = header_values[4]
+        # Header is 5 uint32 big-endian values; only the last four are used
+        if DEBUG:
+            log(f"  Header values: {parse_header(header, start_offset)}")
+        width, height, palette_color_size, palette_count = struct.unpack_from('>4I', header, 4)
 
         if palette_color_size not in [16, 256]:
-            print(f"  [WARN] Unexpected palette size: {palette_color_size}, expected 16 (CI4) or 256 (CI8)")
+            warn(f"  [WARN] Unexpected palette size: {palette_color_size}, expected 16 (CI4) or 256 (CI8)")
             return False
         
         # Determine format: CI4 (16 colors) or CI8 (256 colors)
         format_name = "CI4" if palette_color_size == 16 else "CI8"
         
-        print(f"  {width}x{height} {format_name} ({palette_color_size} colors, {palette_count} palettes)")
+        log(f"  {width}x{height} {format_name} ({palette_color_size} colors, {palette_count} palettes)")
 
         # Sanity check - palette count should be reasonable
         if palette_count > 100 or palette_count < 1:
-            print(f"  [WARN] Unreasonable palette count {palette_count}, using default of 1")
+            warn(f"  [WARN] Unreasonable palette count {palette_count}, using default of 1")
             palette_count = 1
 
         # Calculate sizes
@@ -116,52 +326,50 @@ def convert_16bit_palette_to_png(compressed_data, output_path):
             pixel_indices_size = (width * height + 1) // 2
         
         expected_total = start_offset + pixel_indices_size + palette_size
+        if expected_total > MAX_DECOMPRESSED_SIZE:
+            # Bail out before allocating for, or decompressing, the rest of a corrupt stream
+            warn(f"  [WARN] Header claims {expected_total:,} bytes of image data, over the {MAX_DECOMPRESSED_SIZE:,} byte limit")
+            return False
+        decompressed = decompress_into_array(chunks, expected_total, header)
         if expected_total != len(decompressed):
-            print(f"  [WARN] Unexpected decompressed size: expected {expected_total}, got {len(decompressed)}")
+            warn(f"  [WARN] Unexpected decompressed size: expected {expected_total}, got {len(decompressed)}")
 
         # Extract data sections
         pixel_indices_raw = decompressed[start_offset:start_offset+pixel_indices_size]
         palette_data = decompressed[-palette_size:]
         
         # Convert pixel indices based on format
-        def unpack_ci4_indices(data, pixel_count):
-            """Unpack 4-bit packed indices to 8-bit indices."""
-            indices = []
-            for byte in data:
-                indices.append((byte >> 4) & 0x0F)  # Upper 4 bits
-                indices.append(byte & 0x0F)  # Lower 4 bits
-            return indices[:pixel_count]  # Trim to exact count
-        
         if format_name == "CI8":
-            pixel_indices = list(pixel_indices_raw)
+            # Already one uint8 index per pixel; keep the zero-copy view
+            pixel_indices = pixel_indices_raw
         else:  # CI4
             pixel_indices = unpack_ci4_indices(pixel_indices_raw, width * height)
         
-        print(f"  Pixel indices: {len(pixel_indices)} pixels ({format_name}), Palette data: {len(palette_data)} bytes")
+        log(f"  Pixel indices: {len(pixel_indices)} pixels ({format_name}), Palette data: {len(palette_data)} bytes")
         
         # Decode all palette entries
-        palette_entries = np.frombuffer(palette_data, dtype='>u2').tolist()
+        palette_entries = decode_palette_entries(palette_data)
         
         # Render based on palette count
         if palette_count == 1:
-            render_single_palette(pixel_indices, palette_entries, width, height, output_path)
+            render_single_palette(pixel_indices, palette_entries, width, height, output_path, palette_color_size)
         else:
             render_multiple_palettes(pixel_indices, palette_entries, palette_count, width, height, output_path, palette_color_size)
         
         return True
         
     except Exception as e:
-        print(f"  Error converting 16-bit palette: {e}")
+        warn(f"  Error converting 16-bit palette: {e}")
         return False
 
 def handle_compressed_image(file_info, data, output_path, filename):
     """Handle extraction and conversion of compressed images."""
     size = len(data)
-    print(f"  Converting image: {filename} ({size:,} bytes)")
+    log(f"  Converting image: {filename} ({size:,} bytes)")
 
     # Early return if no format
     if 'format' not in file_info:
-        print(f"  [WARN] No format specified: {filename}")
+        warn(f"  [WARN] No format specified: {filename}")
         return False
 
     format_type = file_info['format']
@@ -169,7 +377,7 @@ def handle_compressed_image(file_info, data, output_path, filename):
     # Handle palette formats (CI4/CI8)
     if format_type in ['CI4', 'CI8']:
         if convert_16bit_palette_to_png(data, output_path):
-            print(f"  [OK] Converted palette image: {filename}")
+            log(f"  [OK] Converted palette image: {filename}")
             return True
 
     # Handle binary formats (16-bit, 24-bit)
@@ -178,11 +386,11 @@ def handle_compressed_image(file_info, data, output_path, filename):
         height = file_info['image_height']
         
         if convert_compressed_binary_to_png(data, width, height, output_path, format_type):
-            print(f"  [OK] Converted binary image: {filename}")
+            log(f"  [OK] Converted binary image: {filename}")
             return True
 
     # Unknown format
-    print(f"  [WARN] Unknown format '{format_type}': {filename}")
+    warn(f"  [WARN] Unknown format '{format_type}': {filename}")
     return False
 
 def calculate_file_size(file_info, file_type, start_addr, end_addr):
@@ -194,14 +402,13 @@ def calculate_file_size(file_info, file_type, start_addr, end_addr):
         # For files without is_compressed flag, read full data
         return end_addr - start_addr + 1
 
-def read_file_data(rom, file_info, file_type):
-    """Read file data from ROM based on file info."""
-    start = int(file_info['start_addr'], 16)
-    end = int(file_info['end_addr'], 16)
+def read_file_data(rom_data, file_info, file_type):
+    """Get a file's data as a slice of the ROM view based on file info."""
+    start = file_info['start_addr_int']
+    end = file_info['end_addr_int']
     size = calculate_file_size(file_info, file_type, start, end)
     
-    rom.seek(start)
-    return rom.read(size)
+    return rom_data[start:start + size]
 
 def handle_text_extraction(file_info, data, output_path, filename):
     """Handle text extraction for both compressed and uncompressed text blocks."""
@@ -211,43 +418,129 @@ def handle_text_extraction(file_info, data, output_path, filename):
         else:
             text_data = data
 
-        # Convert to text and save
-        text_content = text_data.decode('utf-8', errors='replace')
+        # The text is still decoded for the CSV summary (str() also accepts the uncompressed
+        # memoryview), but valid UTF-8 is written to disk as-is instead of being re-encoded
+        try:
+            text_content = str(text_data, 'utf-8')
+            file_data = text_data
+        except UnicodeDecodeError:
+            text_content = str(text_data, 'utf-8', errors='replace')
+            file_data = text_content.encode('utf-8')
         
-        with open(output_path, 'w', encoding='utf-8') as f:
-            f.write(text_content)
+        write_raw_file(output_path, file_data)
         
-        print(f"  {filename} ({len(text_data)} bytes)")
+        log(f"  {filename} ({len(text_data)} bytes)")
         return True, text_content
         
     except Exception as e:
-        print(f"  Error handling text block: {e}")
+        warn(f"  Error handling text block: {e}")
         return False, None
 
 def convert_compressed_binary_to_png(compressed_data, width, height, output_path, format_type="24-bit"):
     """Convert compressed binary image data to PNG format."""
+    if not has_zlib_header(compressed_data):
+        warn("  [WARN] Not a zlib stream, skipping binary conversion")
+        return False
+    
     try:
-        # Decompress the data
-        decompressed = zlib.decompress(compressed_data)
+        # Decompress straight into an image-sized buffer
+        bytes_per_pixel = 2 if format_type == "16-bit" else 3
+        decompressed = decompress_into_array(iter_decompress(zlib.decompressobj(), compressed_data),
+                                             width * height * bytes_per_pixel)
         
         # Convert to image
         if format_type == "16-bit":
             # Convert 16-bit RGBA5551 to RGB
-            words = np.frombuffer(decompressed, dtype='>u2').reshape((height, width))
-            rgb_pixels = [decode_rgba5551_to_rgb(word) for word in words.flatten()]
-            image_data = np.array(rgb_pixels, dtype=np.uint8).reshape((height, width, 3))
+            image_data = decode_rgba5551_image(decompressed, width, height)
         else:
             # 24-bit RGB
-            image_data = np.frombuffer(decompressed, dtype=np.uint8).reshape((height, width, 3))
+            image_data = decompressed.reshape((height, width, 3))
         
         # Save as PNG
-        Image.fromarray(image_data).save(output_path, 'PNG')
+        save_png(image_data, output_path)
         return True
         
     except Exception as e:
-        print(f"  Error converting compressed binary: {e}")
+        warn(f"  Error converting compressed binary: {e}")
         return False
 
+def write_raw_file(path, data, rom_fd=None, rom_offset=0):
+    """Write bytes through a raw file descriptor, skipping Python's buffered file objects.
+    
+    If data is the ROM range starting at rom_offset in rom_fd, it is copied in the
+    kernel with os.sendfile where supported; anything left is written normally.
+    """
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC | getattr(os, 'O_BINARY', 0), 0o644)
+    try:
+        view = memoryview(data)
+        if rom_fd is not None and hasattr(os, 'sendfile'):
+            try:
+                while view:
+                    sent = os.sendfile(fd, rom_fd, rom_offset, len(view))
+                    if not sent:
+                        break
+                    rom_offset += sent
+                    view = view[sent:]
+            except OSError:
+                # File-to-file sendfile is not supported everywhere
+                pass
+        while view:
+            view = view[os.write(fd, view):]
+    finally:
+        os.close(fd)
+
+def process_one_file(rom_data, rom_fd, file_info, file_type, type_dir, type_prefix):
+    """Extract a single file. Returns its log messages and text block CSV row (or None).
+    
+    rom_fd is the ROM's file descriptor, used to copy raw files with sendfile.
+    type_prefix is type_dir as an encoded path with a trailing separator, used for raw writes.
+    """
+    try:
+        return _process_one_file(rom_data, rom_fd, file_info, file_type, type_dir, type_prefix)
+    except BaseException as exc:
+        # The traceback's frames hold memoryview slices of the mapped ROM, which would
+        # stop the map from closing while the error propagates; drop their locals
+        error = exc
+        while error is not None:
+            traceback.clear_frames(error.__traceback__)
+            error = error.__context__
+        raise
+    finally:
+        _task_log.lines = None
+
+def _process_one_file(rom_data, rom_fd, file_info, file_type, type_dir, type_prefix):
+    """Extract a single file; see process_one_file."""
+    messages = _task_log.lines = []
+    text_row = None
+    
+    filename = file_info['filename']
+    data = read_file_data(rom_data, file_info, file_type)
+    
+    # Special handling for compressed images
+    if file_type == 'compressed_images':
+        out_path = os.path.join(type_dir, filename)
+        if not handle_compressed_image(file_info, data, out_path, filename):
+            # Fallback: save raw data
+            write_raw_file(out_path, data)
+    # Special handling for text blocks
+    elif file_type == 'text_blocks':
+        out_path = os.path.join(type_dir, filename)
+        success, text_content = handle_text_extraction(file_info, data, out_path, filename)
+        if success and text_content:
+            # Collect text block data for CSV
+            text_row = {
+                'start_addr': file_info['start_addr'],
+                'end_addr': file_info['end_addr'],
+                'filename': filename,
+                'content': text_content
+            }
+    else:
+        # Normal file extraction
+        write_raw_file(type_prefix + os.fsencode(filename), data, rom_fd, file_info['start_addr_int'])
+        log(f"  {filename} ({len(data):,} bytes)")
+    
+    return messages, text_row
+
 def extract_from_file_table(rom_path, files_by_type, output_dir="extracted"):
     """Extract files using the organized file table."""
     
@@ -257,68 +550,93 @@ def extract_from_file_table(rom_path, files_by_type, output_dir="extracted"):
     
     print(f"Extracting {total_files} files from {len(files_by_type)} types...")
     
-    # Track text blocks for CSV generation
-    text_blocks_data = []
+    # Text block rows are streamed to the CSV as they arrive; it is only created once there is a row
+    csv_path = os.path.join(output_dir, "text_blocks_summary.csv")
+    text_blocks_writer = None
     
-    with open(rom_path, 'rb') as rom:
+    # Map the ROM once; each file is then a zero-copy memoryview slice instead of a seek + read.
+    # The view is released before the map closes, once the pool has finished with it
+    with open(rom_path, 'rb') as rom, mmap.mmap(rom.fileno(), 0, access=mmap.ACCESS_READ) as rom_map, \
+            memoryview(rom_map) as rom_data, ThreadPoolExecutor(max_workers=os.cpu_count()) as executor, ExitStack() as csv_stack:
         for file_type, files in files_by_type.items():
             print(f"\nProcessing {file_type} files ({len(files)} files)...")
             
             # Create subdirectory for this file type
             type_dir = os.path.join(output_dir, file_type)
             os.makedirs(type_dir, exist_ok=True)
+            type_prefix = os.fsencode(os.path.join(type_dir, ''))
             
-            for file_info in files:
-                filename = file_info['filename']
-                data = read_file_data(rom, file_info, file_type)
-                out_path = os.path.join(type_dir, filename)
-                
-                # Special handling for compressed images
-                if file_type == 'compressed_images':
-                    if not handle_compressed_image(file_info, data, out_path, filename):
-                        # Fallback: save raw data
-                        with open(out_path, 'wb') as out:
-                            out.write(data)
-                # Special handling for text blocks
-                elif file_type == 'text_blocks':
-                    success, text_content = handle_text_extraction(file_info, data, out_path, filename)
-                    if success and text_content:
-                        # Collect text block data for CSV
-                        text_blocks_data.append({
-                            'start_addr': file_info['start_addr'],
-                            'end_addr': file_info['end_addr'],
-                            'filename': filename,
-                            'content': text_content
-                        })
-                else:
-                    # Normal file extraction
-                    with open(out_path, 'wb') as out:
-                        out.write(data)
-                    print(f"  {filename} ({len(data):,} bytes)")
-    
-    # Generate CSV for text blocks if any were processed
-    if text_blocks_data:
-        write_text_blocks_csv(text_blocks_data, output_dir)
+            # Files are independent, so extract them in parallel; map() keeps
+            # results (and therefore log output and CSV rows) in table order
+            results = executor.map(
+                lambda file_info: process_one_file(rom_data, rom.fileno(), file_info, file_type, type_dir, type_prefix),
+                files)
+            for messages, text_row in results:
+                for message in messages:
+                    print(message)
+                if text_row:
+                    if text_blocks_writer is None:
+                        text_blocks_writer = open_text_blocks_csv(csv_stack, csv_path)
+                    text_blocks_writer.writerow(text_row)
+            print(f"  Extracted {len(files)} {file_type} files")
+    
+    if text_blocks_writer is not None:
+        print(f"\nText blocks summary saved to: {csv_path}")
     
     print(f"\nExtraction complete! Files saved to: {output_dir}/")
 
-def write_text_blocks_csv(text_blocks_data, output_dir):
-    """Write text blocks data to CSV file."""
-    csv_path = os.path.join(output_dir, "text_blocks_summary.csv")
-    with open(csv_path, 'w', newline='', encoding='utf-8') as csvfile:
-        fieldnames = ['start_addr', 'end_addr', 'filename', 'content']
-        writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-        writer.writeheader()
-        for row in text_blocks_data:
-            writer.writerow(row)
-    print(f"\nText blocks summary saved to: {csv_path}")
+def open_text_blocks_csv(stack, csv_path):
+    """Open the text blocks CSV (closed by the given ExitStack) and write its header."""
+    csvfile = stack.enter_context(open(csv_path, 'w', newline='', encoding='utf-8'))
+    fieldnames = ['start_addr', 'end_addr', 'filename', 'content']
+    writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
+    writer.writeheader()
+    return writer
 
-def load_and_filter_file_table(file_table_json, filter_type=None):
-    """Load file table and apply filter if specified."""
-    with open(file_table_json, 'r') as f:
-        file_table = json.load(f)
+def parse_file_addresses(files_by_type):
+    """Parse each file's hex start/end addresses once, storing them as start_addr_int/end_addr_int."""
+    for files in files_by_type.values():
+        for file_info in files:
+            file_info['start_addr_int'] = int(file_info['start_addr'], 16)
+            file_info['end_addr_int'] = int(file_info['end_addr'], 16)
+
+def load_file_table(file_table_json):
+    """Load the file table's files by type, with addresses pre-parsed.
+    
+    The parsed result is cached in a pickle next to the JSON and reused
+    while the JSON's modification time and size and the cache format
+    version are unchanged.
+    """
+    cache_path = os.path.splitext(file_table_json)[0] + '.cache.pkl'
+    json_stat = os.stat(file_table_json)
+    cache_key = (FILE_TABLE_CACHE_VERSION, json_stat.st_mtime_ns, json_stat.st_size)
+    
+    try:
+        with open(cache_path, 'rb') as f:
+            cached_key, files_by_type = pickle.load(f)
+        if cached_key == cache_key:
+            return files_by_type
+    except Exception:
+        # Missing, stale-format or unreadable cache: rebuild it below
+        pass
+    
+    with open(file_table_json, 'rb') as f:
+        file_table = orjson.loads(f.read()) if orjson else json.load(f)
     
     files_by_type = file_table.get('files', {})
+    parse_file_addresses(files_by_type)
+    
+    try:
+        with open(cache_path, 'wb') as f:
+            pickle.dump((cache_key, files_by_type), f, protocol=pickle.HIGHEST_PROTOCOL)
+    except OSError:
+        pass
+    
+    return files_by_type
+
+def load_and_filter_file_table(file_table_json, filter_type=None):
+    """Load file table and apply filter if specified."""
+    files_by_type = load_file_table(file_table_json)
     
     if filter_type:
         if filter_type in files_by_type:
@@ -333,9 +651,10 @@ def load_and_filter_file_table(file_table_json, filter_type=None):
 
 if __name__ == "__main__":
     if len(sys.argv) < 3:
-        print("Usage: python extract_from_table.py <rom_file> <file_table_json> [output_dir] [--filter type]")
+        print("Usage: python extract_from_table.py <rom_file> <file_table_json> [output_dir] [--filter type] [--png-level 0-9]")
         print("Example: python extract_from_table.py re2.z64 file_table.json extracted_assets")
         print("         python extract_from_table.py re2.z64 file_table.json extracted_assets --filter compressed_images")
+        print("         python extract_from_table.py re2.z64 file_table.json extracted_assets --png-level 9")
         sys.exit(1)
     
     rom_path = sys.argv[1]
@@ -354,7 +673,16 @@ if __name__ == "__main__":
             print("Error: --filter requires a file type")
             sys.exit(1)
     
-    # Set output_dir (only if it's not --filter)
+    # Look for --png-level argument (PNG zlib level; lower is faster, higher is smaller)
+    if '--png-level' in sys.argv:
+        level_idx = sys.argv.index('--png-level')
+        if level_idx + 1 < len(sys.argv) and sys.argv[level_idx + 1] in [str(level) for level in range(10)]:
+            PNG_COMPRESS_LEVEL = int(sys.argv[level_idx + 1])
+        else:
+            print("Error: --png-level requires a level from 0 to 9")
+            sys.exit(1)
+    
+    # Set output_dir (only if it's not an option)
     if len(sys.argv) > 3 and not sys.argv[3].startswith('--'):
         output_dir = sys.argv[3]
     
@@ -7,12 +7,28 @@ Usage: python rom_scanner.py <rom_file>
 import argparse
 import csv
 import json
+import mmap
 import sys
 import os
+import struct
 import zlib
+from bisect import bisect_right
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+import numpy as np
 from typing import List, Dict, Optional, Tuple
 from dataclasses import dataclass
 
+def write_raw_file(path: str, data) -> None:
+    """Write a bytes-like object through a raw file descriptor, skipping Python's buffered file objects."""
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC | getattr(os, 'O_BINARY', 0), 0o644)
+    try:
+        view = memoryview(data)
+        while view:
+            view = view[os.write(fd, view):]
+    finally:
+        os.close(fd)
+
 @dataclass
 class ScanResult:
     """Represents a discovered file/block in the ROM."""
@@ -32,6 +48,9 @@ class ROMScanner:
     COMPRESSED_TERMINATOR = b'\x00\x10\x00\x00'
     UNCOMPRESSED_FOOTER = b'\x00\x01\x00\x00'
     
+    # Big-endian size field that follows a footer
+    _U32BE = struct.Struct('>I')
+    
     # Known large data regions to skip during scanning
     KNOWN_REGIONS = [
         (0x00338FEA, 0x00B63105), # MORT blocks
@@ -40,9 +59,12 @@ class ROMScanner:
         (0x03FD0DF6, 0x03FFFFFF),  # Empty data
     ]
     
-    def __init__(self, rom_path: str, output_dir: str = "extracted_files"):
+    def __init__(self, rom_path: str, output_dir: str = "extracted_files", verbose: bool = False):
         self.rom_path = rom_path
         self.output_dir = output_dir
+        # Prefix for output paths; filenames are plain names, so concatenation suffices
+        self._out_prefix = os.path.join(output_dir, '')
+        self.verbose = verbose
         self.rom_data = None
         self.results = []
         self.file_table = None
@@ -52,7 +74,18 @@ class ROMScanner:
         
         # Load existing file table (read-only)
         self.load_file_table()
+        self._build_known_file_index()
         
+        # Sorted known region bounds for vectorised lookups
+        regions = sorted(self.KNOWN_REGIONS)
+        self._region_starts = np.array([start for start, _ in regions], dtype=np.int64)
+        self._region_ends = np.array([end for _, end in regions], dtype=np.int64)
+        
+    def log(self, message: str):
+        """Print a per-hit detail message (only in verbose mode)."""
+        if self.verbose:
+            print(message)
+            
     def load_file_table(self):
         """Load existing file table (read-only)."""
         try:
@@ -64,29 +97,63 @@ class ROMScanner:
             self.file_table = None
         
     def load_rom(self):
-        """Load ROM data into memory."""
+        """Memory-map the ROM read-only; pages are loaded on demand from the page cache."""
         print(f"Loading ROM: {self.rom_path}")
         with open(self.rom_path, 'rb') as f:
-            self.rom_data = f.read()
+            self.rom_data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if hasattr(self.rom_data, 'madvise'):
+            # The scans walk the ROM front to back
+            self.rom_data.madvise(mmap.MADV_SEQUENTIAL)
         print(f"ROM loaded: {len(self.rom_data):,} bytes")
         
+    def close(self):
+        """Release the memory-mapped ROM."""
+        if self.rom_data is not None:
+            self.rom_data.close()
+            self.rom_data = None
+        
+    def _build_known_file_index(self):
+        """Parse file table addresses once, indexing entries by start address for is_known_file lookups.
+        
+        Entries are (start, end, file_type, filename, is_compressed) tuples.
+        """
+        entries = []
+        files_by_type = self.file_table.get('files', {}) if self.file_table else {}
+        for file_type, files in files_by_type.items():
+            for file_info in files:
+                try:
+                    file_start = int(file_info['start_addr'], 16)
+                    file_end = int(file_info['end_addr'], 16)
+                except Exception:
+                    continue
+                entries.append((file_start, file_end, file_type, file_info.get('filename', ''),
+                                file_info.get('is_compressed', None)))
+        
+        self._known_files_in_order = entries
+        self._known_files = sorted(entries, key=lambda entry: entry[0])
+        self._known_starts = [entry[0] for entry in self._known_files]
+        
+        # Binary search is only exact for disjoint entries; with overlaps the
+        # first match in table order wins, so those tables keep the linear scan
+        self._known_files_overlap = any(
+            current[0] <= previous[1] for previous, current in zip(self._known_files, self._known_files[1:]))
+        
     def is_known_file(self, start_addr: int) -> Tuple[bool, str, str]:
         """Check if address is already known in file table."""
         if not self.file_table:
             return False, "unknown", ""
             
-        files_by_type = self.file_table.get('files', {})
-        
-        # Check all file types for matching addresses
-        for file_type, files in files_by_type.items():
-            for file_info in files:
-                file_start = int(file_info['start_addr'], 16)
-                file_end = int(file_info['end_addr'], 16)
-                
-                if file_start <= start_addr <= file_end:
-                    return True, file_type, file_info.get('filename', '')
-        
-        return False, "unknown", ""
+        if self._known_files_overlap:
+            match = next((entry for entry in self._known_files_in_order
+                          if entry[0] <= start_addr <= entry[1]), None)
+        else:
+            # Only the last entry starting at or before the address can contain it
+            idx = bisect_right(self._known_starts, start_addr) - 1
+            match = self._known_files[idx] if idx >= 0 and start_addr <= self._known_files[idx][1] else None
+            
+        if match is None:
+            return False, "unknown", ""
+        return True, match[2], match[3]
             
     def scan_compressed_blocks(self, start_addr: int = 0, end_addr: Optional[int] = None) -> List[ScanResult]:
         """Scan for compressed blocks with 0x68DE header."""
@@ -95,27 +162,35 @@ class ROMScanner:
             
         print(f"Scanning for compressed blocks: 0x{start_addr:08X} - 0x{end_addr:08X}")
         
-        results = []
-        i = start_addr
-        
-        while i < end_addr - 1:
-            # Skip known large data regions
-            if self._is_in_known_region(i):
-                i = self._skip_known_region(i)
+        # Candidates are located in one vectorised pass; only they are visited in Python.
+        # Block bounds only depend on the terminator search, so they are all found up front
+        blocks = []
+        next_addr = start_addr
+        for i in self._find_header_candidates(start_addr, end_addr).tolist():
+            # Skip candidates inside a block that was already found
+            if i < next_addr:
                 continue
-                
-            # Look for compressed block header
-            if self.rom_data[i:i + 2] == self.COMPRESSED_HEADER:
-                result = self._process_compressed_block(i, end_addr)
+            block_end = self._find_compressed_block_end(i, end_addr)
+            blocks.append((i, block_end))
+            next_addr = block_end
+            
+        # Decompress on worker threads (zlib releases the GIL) while this thread writes
+        # finished blocks in order; at most `window` blocks are decompressed ahead
+        results = []
+        window = 2 * (os.cpu_count() or 1)
+        with ThreadPoolExecutor(max_workers=os.cpu_count()) as pool:
+            submit = lambda block: pool.submit(self._decompress_block, *block)
+            decompressions = deque(submit(block) for block in blocks[:window])
+            for n, (i, block_end) in enumerate(blocks):
+                decompression = decompressions.popleft()
+                if n + window < len(blocks):
+                    decompressions.append(submit(blocks[n + window]))
+                    
+                result = self._process_compressed_block(i, block_end, decompression)
                 if result:
                     results.append(result)
-                    print(f"Found compressed block at 0x{i:08X} -> {result.filename}")
-                    i = result.end_addr + 1
-                else:
-                    i += 1
-            else:
-                i += 1
-                
+                    self.log(f"Found compressed block at 0x{i:08X} -> {result.filename}")
+                    
         print(f"Compressed block scan complete: Found {len(results)} blocks")
         return results
         
@@ -135,57 +210,68 @@ class ROMScanner:
         
         for gap_start, gap_end in gaps:
             gap_size = gap_end - gap_start + 1
-            print(f"  Scanning gap: 0x{gap_start:08X} - 0x{gap_end:08X} ({gap_size:,} bytes)")
+            self.log(f"  Scanning gap: 0x{gap_start:08X} - 0x{gap_end:08X} ({gap_size:,} bytes)")
             
-            for offset in range(gap_start, gap_end - 6):
-                if self.rom_data[offset:offset + 4] == pattern:
-                    print(f"    Found footer pattern at 0x{offset:08X}")
-                    result = self._process_uncompressed_file(offset, gap_start, gap_end)
-                    if result:
-                        results.append(result)
-                        print(f"      -> Extracted to {result.filename} ({result.size} bytes)")
-                    else:
-                        print(f"      -> Failed to process")
+            # Jump from match to match; footers may start up to gap_end - 7, and find()
+            # needs the whole pattern inside its range
+            search_end = max(gap_end - 3, 0)
+            footers = []
+            offset = self.rom_data.find(pattern, gap_start, search_end)
+            while offset != -1:
+                footers.append(offset)
+                offset = self.rom_data.find(pattern, offset + 1, search_end)
+                
+            # Reject implausible size fields for all footers at once; only the rest are processed
+            footers = np.array(footers, dtype=np.int64)
+            for offset, plausible in zip(footers.tolist(), self._plausible_footers(footers).tolist()):
+                self.log(f"    Found footer pattern at 0x{offset:08X}")
+                result = self._process_uncompressed_file(offset, gap_start, gap_end) if plausible else None
+                if result:
+                    results.append(result)
+                    self.log(f"      -> Extracted to {result.filename} ({result.size} bytes)")
+                else:
+                    self.log(f"      -> Failed to process")
                     
         print(f"Uncompressed file scan complete: Found {len(results)} files")
         return results
         
-    def _process_compressed_block(self, start_addr: int, max_end: int) -> Optional[ScanResult]:
-        """Process a single compressed block."""
+    def _decompress_block(self, start_addr: int, block_end: int) -> Optional[bytes]:
+        """Decompress a block (run on the scan's worker threads); None if it is not valid zlib data."""
+        # zlib errors are handled here rather than raised through the Future, whose stored
+        # traceback would keep frames holding views of the mapped ROM alive
         try:
-            # Find block end by looking for terminator
-            block_end = self._find_compressed_block_end(start_addr, max_end)
-            if block_end is None:
-                return None
-                
-            # Extract compressed data
-            compressed_data = self.rom_data[start_addr:block_end]
+            return zlib.decompress(memoryview(self.rom_data)[start_addr:block_end])
+        except zlib.error:
+            return None
+            
+    def _process_compressed_block(self, start_addr: int, block_end: int, decompression: Future) -> Optional[ScanResult]:
+        """Process a single compressed block, given its pending decompression."""
+        try:
+            # Extract compressed data as a zero-copy view of the mapped ROM
+            compressed_data = memoryview(self.rom_data)[start_addr:block_end]
             
             # Check if this is a known file
             is_known, known_type, known_filename = self.is_known_file(start_addr)
             
-            # Attempt decompression
-            try:
-                decompressed_data = zlib.decompress(compressed_data)
-                
+            # Wait for the decompression attempt
+            decompressed_data = decompression.result()
+            if decompressed_data is not None:
                 # Use known filename if available, otherwise generate one
                 if is_known and known_filename:
                     filename = known_filename
                 else:
                     filename = f"decompressed_0x{start_addr:08X}.bin"
-                filepath = os.path.join(self.output_dir, filename)
-                with open(filepath, 'wb') as f:
-                    f.write(decompressed_data)
+                filepath = self._out_prefix + filename
+                write_raw_file(filepath, decompressed_data)
                     
-            except zlib.error:
+            else:
                 # Decompression failed, treat as binary
                 if is_known and known_filename:
                     filename = known_filename
                 else:
                     filename = f"compressed_0x{start_addr:08X}.bin"
-                filepath = os.path.join(self.output_dir, filename)
-                with open(filepath, 'wb') as f:
-                    f.write(compressed_data)
+                filepath = self._out_prefix + filename
+                write_raw_file(filepath, compressed_data)
                 decompressed_data = compressed_data
                 
             return ScanResult(
@@ -204,6 +290,16 @@ class ROMScanner:
         except Exception as e:
             return None
             
+    def _plausible_footers(self, footers: np.ndarray) -> np.ndarray:
+        """Return a mask of footers whose size field passes _process_uncompressed_file's size checks."""
+        data = np.frombuffer(self.rom_data, dtype=np.uint8)
+        fits = footers + 8 <= len(data)
+        
+        # Gather each 4-byte big-endian size field (clamped at the ROM end; those footers fail `fits`)
+        size_bytes = data[np.minimum(footers[:, None] + np.arange(4, 8), len(data) - 1)]
+        sizes = size_bytes.view('>u4')[:, 0].astype(np.int64)
+        return fits & (sizes >= 4) & (sizes <= 0x1000000) & (footers - sizes >= 0)
+        
     def _process_uncompressed_file(self, footer_pos: int, gap_start: int, gap_end: int) -> Optional[ScanResult]:
         """Process a single uncompressed file."""
         try:
@@ -213,9 +309,8 @@ class ROMScanner:
             if size_field_end > len(self.rom_data):
                 return None
                 
-            # Read file size from 4 bytes after footer
-            size_bytes = self.rom_data[size_field_start:size_field_end]
-            file_size = int.from_bytes(size_bytes, byteorder='big')
+            # Read file size from 4 bytes after footer, straight from the ROM buffer
+            file_size, = self._U32BE.unpack_from(self.rom_data, size_field_start)
             
             # Calculate file boundaries
             # File layout: [file_data][footer: 00 01 00 00][size: 4 bytes]
@@ -235,11 +330,11 @@ class ROMScanner:
             
             # Check if the entire file region is within the gap we're scanning
             if complete_file_start < gap_start or complete_file_end > gap_end:
-                print(f"      -> File region 0x{complete_file_start:08X}-0x{complete_file_end:08X} extends outside gap 0x{gap_start:08X}-0x{gap_end:08X}")
+                self.log(f"      -> File region 0x{complete_file_start:08X}-0x{complete_file_end:08X} extends outside gap 0x{gap_start:08X}-0x{gap_end:08X}")
                 return None
                 
-            # Extract complete file (data + footer + size)
-            file_data = self.rom_data[complete_file_start:complete_file_end + 1]
+            # Extract complete file (data + footer + size) as a zero-copy view
+            file_data = memoryview(self.rom_data)[complete_file_start:complete_file_end + 1]
             
             # Check if this is a known file
             is_known, known_type, known_filename = self.is_known_file(file_data_start)
@@ -249,9 +344,8 @@ class ROMScanner:
                 filename = known_filename
             else:
                 filename = f"uncompressed_0x{file_data_start:08X}.bin"
-            filepath = os.path.join(self.output_dir, filename)
-            with open(filepath, 'wb') as f:
-                f.write(file_data)
+            filepath = self._out_prefix + filename
+            write_raw_file(filepath, file_data)
                 
             return ScanResult(
                 start_addr=complete_file_start,
@@ -262,7 +356,7 @@ class ROMScanner:
                 extracted_path=filepath,
                 metadata={
                     "footer_pos": footer_pos,
-                    "size_bytes": size_bytes.hex().upper()
+                    "size_bytes": self.rom_data[size_field_start:size_field_end].hex().upper()
                 }
             )
             
@@ -272,28 +366,34 @@ class ROMScanner:
             
     def _find_compressed_block_end(self, start_addr: int, max_end: int) -> Optional[int]:
         """Find the end of a compressed block."""
-        # Look for compressed block terminator
-        for offset in range(start_addr + 2, min(start_addr + 1000000, max_end - 7)):
-            if self.rom_data[offset:offset + 4] == self.COMPRESSED_TERMINATOR:
-                return offset + 8  # Include terminator (4 bytes) + size field (4 bytes)
-                
+        # Look for compressed block terminator starting before the search limit;
+        # find() needs the whole pattern inside its range, hence the + 3
+        limit = min(start_addr + 1000000, max_end - 7)
+        offset = self.rom_data.find(self.COMPRESSED_TERMINATOR, start_addr + 2, limit + 3)
+        if offset != -1:
+            return offset + 8  # Include terminator (4 bytes) + size field (4 bytes)
+            
         # If no terminator found, assume reasonable limit
         return min(start_addr + 1000000, max_end)
         
             
-    def _is_in_known_region(self, addr: int) -> bool:
-        """Check if address is in a known large data region."""
-        for start, end in self.KNOWN_REGIONS:
-            if start <= addr <= end:
-                return True
-        return False
+    def _find_header_candidates(self, start_addr: int, end_addr: int) -> np.ndarray:
+        """Find all compressed header offsets in [start_addr, end_addr - 1) outside known regions."""
+        data = np.frombuffer(self.rom_data, dtype=np.uint8)
+        stop = min(end_addr - 1, len(data) - 1)
+        if stop <= start_addr:
+            return np.empty(0, dtype=np.intp)
+            
+        first, second = self.COMPRESSED_HEADER
+        candidates = np.flatnonzero((data[start_addr:stop] == first) & (data[start_addr + 1:stop + 1] == second))
+        candidates += start_addr
+        return candidates[~self._in_known_region(candidates)]
         
-    def _skip_known_region(self, addr: int) -> int:
-        """Skip to the end of a known region."""
-        for start, end in self.KNOWN_REGIONS:
-            if start <= addr <= end:
-                return end + 1
-        return addr + 1
+    def _in_known_region(self, addrs: np.ndarray) -> np.ndarray:
+        """Return a mask of which addresses fall in a known large data region."""
+        # Binary search for the last region starting at or before each address
+        idx = np.searchsorted(self._region_starts, addrs, side='right') - 1
+        return (idx >= 0) & (addrs <= self._region_ends[np.maximum(idx, 0)])
         
     def _find_gaps_between_regions(self, compressed_results: List[ScanResult]) -> List[Tuple[int, int]]:
         """Find gaps between all known regions in the ROM."""
@@ -307,21 +407,12 @@ class ROMScanner:
         # Add regions from file table
         # IMPORTANT: Do NOT add known UNCOMPRESSED regions here so they remain
         # eligible for uncompressed scanning (they should be treated like gaps).
-        if self.file_table:
-            files_by_type = self.file_table.get('files', {})
-            for file_type, files in files_by_type.items():
-                for file_info in files:
-                    try:
-                        file_start = int(file_info['start_addr'], 16)
-                        file_end = int(file_info['end_addr'], 16)
-                    except Exception:
-                        continue
-                    is_compressed_flag = file_info.get('is_compressed', None)
-                    # Only add as known (to skip) if compressed or unknown; leave explicit False (uncompressed) out
-                    if is_compressed_flag is False:
-                        # known uncompressed -> let scanner process it as a candidate by leaving it out of known regions
-                        continue
-                    known_regions.append((file_start, file_end))
+        for file_start, file_end, _, _, is_compressed_flag in self._known_files_in_order:
+            # Only add as known (to skip) if compressed or unknown; leave explicit False (uncompressed) out
+            if is_compressed_flag is False:
+                # known uncompressed -> let scanner process it as a candidate by leaving it out of known regions
+                continue
+            known_regions.append((file_start, file_end))
         
         # Add known large data regions
         known_regions.extend(self.KNOWN_REGIONS)
@@ -340,7 +431,7 @@ class ROMScanner:
                 gap_size = start - current_addr
                 gaps.append((current_addr, start - 1))
                 if gap_size > 1024:  # Only log gaps larger than 1KB
-                    print(f"  Large gap: 0x{current_addr:08X} - 0x{start-1:08X} ({gap_size:,} bytes)")
+                    self.log(f"  Large gap: 0x{current_addr:08X} - 0x{start-1:08X} ({gap_size:,} bytes)")
             current_addr = max(current_addr, end + 1)
         
         # Add final gap if needed
@@ -348,7 +439,7 @@ class ROMScanner:
             gap_size = rom_size - current_addr
             gaps.append((current_addr, rom_size - 1))
             if gap_size > 1024:
-                print(f"  Final gap: 0x{current_addr:08X} - 0x{rom_size-1:08X} ({gap_size:,} bytes)")
+                self.log(f"  Final gap: 0x{current_addr:08X} - 0x{rom_size-1:08X} ({gap_size:,} bytes)")
         
         print(f"  Found {len(gaps)} gaps total")
         return gaps
@@ -391,16 +482,10 @@ class ROMScanner:
             print("No results to map")
             return
             
-        # Sort results by start address
-        sorted_results = sorted(self.results, key=lambda x: x.start_addr)
-        
-        # Create mapping data
-        map_data = []
         rom_size = len(self.rom_data)
         
-        # Add all discovered files
-        for result in sorted_results:
-            map_data.append(self._create_file_entry(result))
+        # Add all discovered files as (start, end, row)
+        regions = [(result.start_addr, result.end_addr, self._create_file_entry(result)) for result in self.results]
         
         # Add known regions as proper entries
         known_region_labels = {
@@ -411,7 +496,7 @@ class ROMScanner:
         }
         
         for start, end in self.KNOWN_REGIONS:
-            map_data.append({
+            regions.append((start, end, {
                 'Start Address': f"0x{start:08X}",
                 'End Address': f"0x{end:08X}",
                 'Size (bytes)': end - start + 1,
@@ -421,30 +506,25 @@ class ROMScanner:
                 'Filename': "",
                 'Compressed Size': "",
                 'Decompressed Size': ""
-            })
+            }))
         
-        # Sort all regions by start address
-        all_regions = sorted(map_data, key=lambda x: int(x['Start Address'], 16))
+        # Sort all regions by start address, once
+        regions.sort(key=lambda region: region[0])
         
-        # Find actual gaps between all regions
-        gaps = []
+        # Sweep the regions in order, emitting a gap row wherever they leave space;
+        # each gap starts after every earlier region, so the rows come out sorted
+        all_regions = []
         current_addr = 0
         
-        for region in all_regions:
-            region_start = int(region['Start Address'], 16)
-            region_end = int(region['End Address'], 16)
-            
+        for region_start, region_end, row in regions:
             if current_addr < region_start:
-                gaps.append(self._create_gap_entry(current_addr, region_start - 1))
+                all_regions.append(self._create_gap_entry(current_addr, region_start - 1))
+            all_regions.append(row)
             current_addr = region_end + 1
         
         # Add final gap if ROM doesn't end with last region
         if current_addr < rom_size:
-            gaps.append(self._create_gap_entry(current_addr, rom_size - 1))
-        
-        # Combine and sort all regions
-        all_regions = all_regions + gaps
-        all_regions.sort(key=lambda x: int(x['Start Address'], 16))
+            all_regions.append(self._create_gap_entry(current_addr, rom_size - 1))
         
         # Write to CSV
         with open(output_file, 'w', newline='', encoding='utf-8') as csvfile:
@@ -455,9 +535,7 @@ class ROMScanner:
             
             writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
             writer.writeheader()
-            
-            for region in all_regions:
-                writer.writerow(region)
+            writer.writerows(all_regions)
         
         print(f"ROM map generated: {output_file}")
 
@@ -465,6 +543,7 @@ def main():
     """Main function."""
     parser = argparse.ArgumentParser(description="Unified ROM Scanner Pipeline")
     parser.add_argument("rom_file", help="Path to ROM file")
+    parser.add_argument("-v", "--verbose", action="store_true", help="Log every block, footer and gap")
     
     args = parser.parse_args()
     
@@ -473,7 +552,7 @@ def main():
         sys.exit(1)
         
     # Initialize scanner
-    scanner = ROMScanner(args.rom_file)
+    scanner = ROMScanner(args.rom_file, verbose=args.verbose)
     scanner.load_rom()
     
     # Scan the whole ROM for both compressed and uncompressed files
@@ -493,6 +572,7 @@ def main():
     
     print(f"\n3. Generating ROM map...")
     scanner.generate_rom_map()
+    scanner.close()
         
     print(f"\n" + "="*60)
     print("SCAN COMPLETE!")